@@ -1,8 +1,77 @@
+import os
+from collections import Counter
+from collections.abc import Iterable
+from functools import lru_cache
+from heapq import heapify, heappop, heappush
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Длина строки, начиная с которой частоты считаются через numpy
+NUMPY_MIN_LEN = 2 ** 15
+# Длина строки, начиная с которой упаковка кода выполняется скомпилированным ядром
+PACK_MIN_LEN = 2 ** 12
+# Максимальная длина кода, которую вмещает 64-битный накопитель ядра
+PACK_MAX_CODE_LEN = 56
+# Количество потоков для упаковки и минимальная длина части строки на один поток
+PACK_WORKERS = os.cpu_count() or 1
+PACK_CHUNK_LEN = 2 ** 18
+# Максимальная длина кода, для которой строится таблица декодирования на 2^L элементов
+DECODE_LUT_MAX_BITS = 16
+
+
+def _pack_kernel(indexes, codes, lengths, out, n_bits) -> int:
+    """
+    Упаковка кодов символов в байты (компилируется numba)
+    indexes: массив номеров символов строки в таблицах codes и lengths
+    codes: массив кодов символов
+    lengths: массив длин кодов в битах
+    out: выходной массив uint8 достаточного размера
+    n_bits: смещение первого кода в битах (0-7), старшие биты первого байта остаются нулевыми
+    результат: количество записанных битов вместе со смещением
+    """
+    acc = 0
+    pos = 0
+    for i in range(indexes.shape[0]):
+        k = indexes[i]
+        acc = (acc << lengths[k]) | codes[k]
+        n_bits += lengths[k]
+        while n_bits >= 8:
+            n_bits -= 8
+            out[pos] = (acc >> n_bits) & 0xFF
+            pos += 1
+        # В накопителе оставляем только несброшенные биты
+        acc &= (1 << n_bits) - 1
+    if n_bits:
+        out[pos] = (acc << (8 - n_bits)) & 0xFF
+    return pos * 8 + n_bits
+
+
+@lru_cache(maxsize=None)
+def _load_pack():
+    """
+    Импорт numba и компиляция ядра упаковки (при первом обращении, а не при импорте модуля)
+    результат: скомпилированное ядро или None, если numba нет;
+    без numba ядро не используется: цикл по массивам numpy в Python медленнее encode_bytes
+    """
+    try:
+        from numba import njit
+    except ImportError:
+        return None
+    return njit(cache=True, nogil=True)(_pack_kernel)
+
+
 class Node:
     """Класс узла дерева для генерации кода Хаффмана"""
-    def __init__(self, chars: str, count: int):
-        # Символ(ы) входного алфавита
-        self.chars = chars
+    __slots__ = ("symbol", "weight", "left", "right")
+
+    def __init__(self, symbol: str | None, count: int):
+        # Символ входного алфавита (только у листа, у внутренних узлов None)
+        self.symbol = symbol
         # Количество вхождений символа (символов) в исходной строке
         self.weight = count
         # Левое и правое поддерево
@@ -17,100 +86,121 @@ class HTree:
         self.root = None
         # Таблица кодировки (создается на основе дерева)
         self.encode_table = dict()
+        # Обратная таблица для декодирования {код: символ}
+        self.decode_table = dict()
+        # Таблица кодов в виде чисел {символ: (код, длина кода в битах)}
+        self.code_table = dict()
+        # Массивы для ядра упаковки: индекс символа по его номеру (-1 если символа нет),
+        # коды символов и длины кодов
+        self.pack_index = None
+        self.pack_codes = None
+        self.pack_lengths = None
+        # Таблица декодирования: для каждого окна из decode_bits битов пара (символ, длина кода)
+        self.decode_lut = None
+        self.decode_bits = 0
 
-    def create_tree(self, freqs: list[tuple[str, int]]):
+    def create_tree(self, freqs: Iterable[tuple[str, int]]):
         """
         Построение дерева кодирование (H-дерева)
-        freqs: таблица частотности
-        """
-        # Список свободных узлов
-        free_leaves = []
-        for it in freqs:
-            leaf = Node(it[0], it[1])
-            free_leaves.append(leaf)
-        # Сортируем список свободных узлов по убыванию
-        free_leaves = sorted(free_leaves, key=lambda x: x.weight, reverse=True)
-        # Итерационно заполняем дерево пока в списке свободных узлов не останется один узел (корень)
+        freqs: таблица частотности (любой итерируемый объект пар (символ, количество))
+        """
+        # Счетчик для разрешения равенства весов (узлы между собой не сравниваются)
+        counter = count()
+        # Куча свободных узлов в виде кортежей (вес, порядковый номер, узел)
+        free_leaves = [(weight, next(counter), Node(c, weight)) for c, weight in freqs]
+        # Пустой алфавит: дерево и таблицы кодировки остаются пустыми
+        if not free_leaves:
+            return
+        heapify(free_leaves)
+        # Итерационно заполняем дерево пока в куче свободных узлов не останется один узел (корень)
         while len(free_leaves) > 1:
             # Выбираются два свободных узла дерева с наименьшими весами
-            l_leaf_index, r_leaf_index = self.__find_min_items_indexis__(free_leaves)
-            l_leaf = free_leaves[l_leaf_index]
-            r_leaf = free_leaves[r_leaf_index]
+            l_weight, _, l_leaf = heappop(free_leaves)
+            r_weight, _, r_leaf = heappop(free_leaves)
             # Создается их родитель с весом, равным их суммарному весу
-            parent_str = l_leaf.chars + r_leaf.chars
-            parent_weight = l_leaf.weight + r_leaf.weight
-            parent = Node(parent_str, parent_weight)
+            parent_weight = l_weight + r_weight
+            parent = Node(None, parent_weight)
             parent.left = l_leaf
             parent.right = r_leaf
-            # Родитель добавляется в список свободных узлов, а два его потомка удаляются из этого списка
-            if r_leaf_index > l_leaf_index:
-                free_leaves.pop(r_leaf_index)
-                free_leaves.pop(l_leaf_index)
-            else:
-                free_leaves.pop(l_leaf_index)
-                free_leaves.pop(r_leaf_index)
-            free_leaves.append(parent)
+            # Родитель добавляется в кучу свободных узлов
+            heappush(free_leaves, (parent_weight, next(counter), parent))
         # Корень дерева
-        self.root = free_leaves[0]
+        self.root = free_leaves[0][2]
         # Создание таблицы кодировки
-        self.__h_tree_to_table__(freqs)
-
-    def __find_min_items_indexis__(self, nodes_list: list) -> tuple[int, int]:
-        """
-        Возвращает индексы двух минимальных элементов списка
-        nodes_list: список вида list<Node>
-        : результат кортеж значений индексов
-        """
-        weights = [it.weight for it in nodes_list]
-        min_index = len(weights) - 1
-        min_val = weights[-1]
-        for i in range(len(weights) - 1, -1, -1):
-            if weights[i] < min_val:
-                min_val = weights[i]
-                min_index = i
-        min_1_index = min_index
-
-        min_index = len(weights) - 1
-        if min_index == min_1_index:
-            min_index = len(weights) - 2
-        min_val = weights[min_index]
-        for i in range(len(weights) - 1, -1, -1):
-            if i == min_1_index:
-                continue
-            if weights[i] < min_val:
-                min_val = weights[i]
-                min_index = i
-        min_2_index = min_index
-        # res = tuple(sorted([min_2_index, min_1_index]))
-        return min_2_index, min_1_index
+        self.__build_table__()
+        self.decode_table = {code: c for c, code in self.encode_table.items()}
+        self.code_table = {c: (int(code, 2), len(code)) for c, code in self.encode_table.items()}
 
-    def __h_tree_to_table__(self, freqs: list[tuple[str, int]]):
+    def __build_table__(self):
         """
-        freqs: таблица частотности
         Создает на основе H-дерева таблицу кодировки
+        (из дерева берутся только длины кодов, сами коды назначаются канонически)
         """
-        for it in freqs:
-            c, _ = it
-            c_code = self.__encode_char_by_tree__(c)
-            self.encode_table[c] = c_code
-        print(self.encode_table)
+        # Один обход дерева в глубину: длина кода символа равна глубине листа
+        lengths = []
+        stack = [(self.root, 0)]
+        while stack:
+            node, depth = stack.pop()
+            # Лист дерева - символ входного алфавита
+            if node.symbol is not None:
+                # Дерево из одного листа кодируем одним битом
+                lengths.append((depth or 1, node.symbol))
+                continue
+            stack.append((node.left, depth + 1))
+            stack.append((node.right, depth + 1))
+        # Канонический код Хаффмана: коды идут подряд в порядке (длина, символ)
+        code = 0
+        prev_length = 0
+        for length, symbol in sorted(lengths):
+            code <<= length - prev_length
+            self.encode_table[symbol] = format(code, f"0{length}b")
+            code += 1
+            prev_length = length
 
-    def __encode_char_by_tree__(self, c: str) -> str:
+    def __build_pack_arrays__(self) -> bool:
         """
-        Кодирование символа с помощью H-дерева
-        c: кодируемый символ
-        результат: код (двоичный)
+        Создает массивы для ядра упаковки (при первом вызове, encode их не использует)
+        результат: True, если ядро можно использовать для этой таблицы кодов
+        """
+        if self.pack_index is not None:
+            return True
+        if np is None or not self.code_table or _load_pack() is None:
+            return False
+        if max(length for _, length in self.code_table.values()) > PACK_MAX_CODE_LEN:
+            return False
+        symbols = list(self.code_table)
+        points = [ord(c) for c in symbols]
+        pack_index = np.full(max(points) + 1, -1, dtype=np.int32)
+        pack_index[points] = np.arange(len(points), dtype=np.int32)
+        self.pack_codes = np.array([self.code_table[c][0] for c in symbols], dtype=np.int64)
+        self.pack_lengths = np.array([self.code_table[c][1] for c in symbols], dtype=np.int64)
+        # Дерево может быть общим для нескольких потоков (кэш _tree_for):
+        # признак готовности pack_index присваивается последним
+        self.pack_index = pack_index
+        return True
+
+    def __build_decode_lut__(self) -> bool:
+        """
+        Создает таблицу декодирования по окну из L битов (L - максимальная длина кода):
+        все окна, начинающиеся с кода символа, указывают на этот символ
+        (при первом вызове, encode ее не использует)
+        результат: True, если таблица построена
         """
-        current_leaf = self.root
-        code = ""
-        while current_leaf.chars != c:
-            if c in current_leaf.left.chars:
-                code += "0"
-                current_leaf = current_leaf.left
-            else:
-                code += "1"
-                current_leaf = current_leaf.right
-        return code
+        if self.decode_lut is not None:
+            return True
+        if not self.code_table:
+            return False
+        width = max(length for _, length in self.code_table.values())
+        if width > DECODE_LUT_MAX_BITS:
+            return False
+        lut = [None] * (1 << width)
+        for symbol, (code, length) in self.code_table.items():
+            shift = width - length
+            lut[code << shift:(code + 1) << shift] = [(symbol, length)] * (1 << shift)
+        # Признак готовности decode_lut присваивается последним (дерево может быть общим для потоков)
+        self.decode_bits = width
+        self.decode_lut = lut
+        return True
 
     def encode_char(self, c: str) -> str:
         """
@@ -120,6 +210,176 @@ class HTree:
         """
         return self.encode_table[c]
 
+    def encode_bytes(self, s: str) -> tuple[bytes, int]:
+        """
+        Кодирование строки в упакованный двоичный вид
+        s: исходная строка текста
+        результат: кортеж (байты кода, количество значащих битов);
+        последний байт дополняется нулевыми битами справа
+        """
+        if len(s) >= PACK_MIN_LEN and self.__build_pack_arrays__():
+            return self.__encode_bytes_compiled__(s)
+        code_table = self.code_table
+        buf = bytearray()
+        # Накопитель битов и количество битов в нем
+        acc = 0
+        n_bits = 0
+        for ch in s:
+            code, length = code_table[ch]
+            acc = (acc << length) | code
+            n_bits += length
+            # Сбрасываем в буфер сразу по 8 байт
+            if n_bits >= 64:
+                n_bits -= 64
+                buf += (acc >> n_bits).to_bytes(8, "big")
+                acc &= (1 << n_bits) - 1
+        total_bits = len(buf) * 8 + n_bits
+        # Остаток (меньше 64 битов) выравниваем до целого байта
+        if n_bits:
+            buf += (acc << (-n_bits % 8)).to_bytes((n_bits + 7) // 8, "big")
+        return bytes(buf), total_bits
+
+    def __encode_bytes_compiled__(self, s: str) -> tuple[bytes, int]:
+        """
+        Кодирование строки в упакованный двоичный вид скомпилированным ядром
+        s: исходная строка текста
+        результат: кортеж (байты кода, количество значащих битов)
+        """
+        points = np.frombuffer(s.encode("utf-32-le", "surrogatepass"), dtype=np.uint32)
+        # Символы, которых нет в таблице кодировки
+        unknown = points >= len(self.pack_index)
+        if unknown.any():
+            raise KeyError(chr(points[unknown.argmax()]))
+        indexes = self.pack_index[points]
+        unknown = indexes < 0
+        if unknown.any():
+            raise KeyError(chr(points[unknown.argmax()]))
+        _pack = _load_pack()
+        n_chunks = min(PACK_WORKERS, len(indexes) // PACK_CHUNK_LEN)
+        if n_chunks <= 1:
+            total_bits = int(self.pack_lengths[indexes].sum())
+            out = np.zeros((total_bits + 7) // 8, dtype=np.uint8)
+            _pack(indexes, self.pack_codes, self.pack_lengths, out, 0)
+            return out.tobytes(), total_bits
+        # Строка делится на части, каждая часть упаковывается в своем потоке
+        # (ядро отпускает GIL); начало части в битах известно заранее по длинам кодов
+        starts = np.linspace(0, len(indexes), n_chunks + 1).astype(np.int64)
+        chunk_bits = np.add.reduceat(self.pack_lengths[indexes], starts[:-1])
+        bit_starts = np.concatenate(([0], np.cumsum(chunk_bits)))
+        total_bits = int(bit_starts[-1])
+
+        def pack_chunk(i):
+            offset = int(bit_starts[i]) % 8
+            part = np.zeros((offset + int(chunk_bits[i]) + 7) // 8, dtype=np.uint8)
+            _pack(indexes[starts[i]:starts[i + 1]], self.pack_codes, self.pack_lengths, part, offset)
+            return part
+
+        with ThreadPoolExecutor(n_chunks) as pool:
+            parts = list(pool.map(pack_chunk, range(n_chunks)))
+        # Части склеиваются через OR: общий байт на границе частей содержит биты обеих
+        out = np.zeros((total_bits + 7) // 8, dtype=np.uint8)
+        for i, part in enumerate(parts):
+            pos = int(bit_starts[i]) // 8
+            out[pos:pos + len(part)] |= part
+        return out.tobytes(), total_bits
+
+    def decode_str(self, bits: str) -> str:
+        """
+        Декодирование строки (через таблицу окон, для длинных кодов - через обратную таблицу)
+        bits: код Хаффмана вида '1001011'
+        результат: декодированная строка
+        (ValueError, если биты не складываются в последовательность полных кодов)
+        """
+        out = []
+        if self.__build_decode_lut__():
+            lut = self.decode_lut
+            width = self.decode_bits
+            n = len(bits)
+            # Дополняем нулями, чтобы окно в конце строки было полным
+            bits += "0" * width
+            pos = 0
+            while pos < n:
+                entry = lut[int(bits[pos:pos + width], 2)]
+                # Окно не начинается ни с одного кода (например '1' для дерева из одного листа)
+                if entry is None:
+                    raise ValueError(f"Недопустимый код в позиции {pos}")
+                symbol, length = entry
+                out.append(symbol)
+                pos += length
+            # Последний код оказался неполным
+            if pos > n:
+                raise ValueError("Неполный код в конце строки")
+            return "".join(out)
+        decode_table = self.decode_table
+        # Начало текущего (еще не распознанного) кода
+        start = 0
+        for i in range(len(bits)):
+            # Код префиксный, поэтому первое совпадение с таблицей однозначно
+            ch = decode_table.get(bits[start:i + 1])
+            if ch is not None:
+                out.append(ch)
+                start = i + 1
+        # Оставшиеся биты не образуют полного кода (в том числе любые биты для пустого дерева)
+        if start != len(bits):
+            raise ValueError("Неполный код в конце строки")
+        return "".join(out)
+
+    def decode_bytes(self, data: bytes, n_bits: int) -> str:
+        """
+        Декодирование упакованного кода (результата encode_bytes)
+        data: байты кода
+        n_bits: количество значащих битов
+        результат: декодированная строка
+        (ValueError, если биты не складываются в последовательность полных кодов)
+        """
+        if not self.__build_decode_lut__():
+            bits = format(int.from_bytes(data, "big"), f"0{len(data) * 8}b")
+            return self.decode_str(bits[:n_bits])
+        lut = self.decode_lut
+        width = self.decode_bits
+        mask = (1 << width) - 1
+        # Дополняем нулями, чтобы окно в конце кода было полным
+        data = bytes(data) + bytes((width + 7) // 8)
+        out = []
+        # Накопитель прочитанных, но еще не декодированных битов
+        acc = 0
+        acc_bits = 0
+        i = 0
+        pos = 0
+        while pos < n_bits:
+            while acc_bits < width:
+                acc = (acc << 8) | data[i]
+                i += 1
+                acc_bits += 8
+            entry = lut[(acc >> (acc_bits - width)) & mask]
+            # Окно не начинается ни с одного кода (например '1' для дерева из одного листа)
+            if entry is None:
+                raise ValueError(f"Недопустимый код в позиции {pos}")
+            symbol, length = entry
+            out.append(symbol)
+            pos += length
+            acc_bits -= length
+            acc &= (1 << acc_bits) - 1
+        # Последний код оказался неполным
+        if pos > n_bits:
+            raise ValueError("Неполный код в конце строки")
+        return "".join(out)
+
+
+def _count_symbols(s: str) -> Iterable[tuple[str, int]]:
+    """
+    Подсчет вхождений символов в строке без промежуточного списка
+    s: исходная строка (текст)
+    результат: итерируемый объект пар (символ, количество вхождений)
+    """
+    # Длинные строки считаем в numpy: массив кодов символов + np.unique
+    if np is not None and len(s) >= NUMPY_MIN_LEN:
+        codes = np.frombuffer(s.encode("utf-32-le", "surrogatepass"), dtype=np.uint32)
+        values, counts = np.unique(codes, return_counts=True)
+        return zip(map(chr, values.tolist()), counts.tolist())
+    # Counter подсчитывает все символы за один проход по строке
+    return Counter(s).items()
+
 
 def frequencies(s: str) -> list[tuple[str, int]]:
     """
@@ -129,16 +389,33 @@ def frequencies(s: str) -> list[tuple[str, int]]:
     где str - символ из исходного текста
     int - количество вхождений данного символа
     """
-    freqs = []
-    # Список с символами, которые уже встречались
-    symbols = []
-    for c in s:
-        if c not in symbols:
-            symbols.append(c)
-            # Кортеж вида (str, int)
-            fr = c, s.count(c)
-            freqs.append(fr)
-    return freqs
+    return list(_count_symbols(s))
+
+
+def build_htree(s: str) -> HTree:
+    """
+    Построение H-дерева непосредственно по строке
+    (пары из подсчета сразу идут в кучу, без списка частот)
+    s: исходная строка (текст)
+    результат: H-дерево (для пустой строки - пустое дерево с пустыми таблицами)
+    """
+    h_t = HTree()
+    h_t.create_tree(_count_symbols(s))
+    return h_t
+
+
+@lru_cache(maxsize=8)
+def _tree_for(freqs: tuple[tuple[str, int], ...]) -> HTree:
+    """
+    Возвращает H-дерево для таблицы частотности
+    (повторные вызовы с той же таблицей берут дерево из кэша)
+    freqs: таблица частотности в виде кортежа кортежей
+    (пары приводятся к кортежам вызывающим кодом, чтобы ключ кэша был хешируемым,
+    например для таблицы из JSON вида [["a", 3], ...])
+    """
+    h_t = HTree()
+    h_t.create_tree(freqs)
+    return h_t
 
 
 def encode(freqs: list[tuple[str, int]], s: str) -> str:
@@ -148,25 +425,56 @@ def encode(freqs: list[tuple[str, int]], s: str) -> str:
     s: исходная строка текста
     результат: строка вида '1001011' как код Хаффмана
     """
-    # Если в таблице частотности один или меньше символов то выход
-    if len(freqs) <= 1:
-        return None
+    # Пустой алфавит - пустой код (любой символ строки в алфавит не входит)
+    if not freqs:
+        if s:
+            raise KeyError(s[0])
+        return ""
+    # Алфавит из одного символа: каждый символ кодируется одним битом, дерево не нужно
+    if len(freqs) == 1:
+        symbol = freqs[0][0]
+        if s.count(symbol) != len(s):
+            raise KeyError(next(ch for ch in s if ch != symbol))
+        return "0" * len(s)
     # Сортируем список частоты символов по убыванию TODO удалить сортировку
     # freqs = sorted(freqs, key=lambda val: val[1], reverse=True)
-    # Создаем H-дерево
-    h_t = HTree()
-    h_t.create_tree(freqs)
+    # Получаем H-дерево (общее для encode и decode)
+    h_t = _tree_for(tuple(map(tuple, freqs)))
+    # Коды символов склеиваются одним вызовом join (без квадратичной конкатенации)
+    encode_table = h_t.encode_table
+    return "".join([encode_table[ch] for ch in s])
+
+
+def decode(freqs: list[tuple[str, int]], bits: str) -> str:
+    """
+    Функция декодирования кода Хаффмана в строку
+    freqs: список частоты вхождения символов в тексте
+    bits: строка вида '1001011' как код Хаффмана
+    результат: декодированная строка текста
+    (ValueError, если биты не складываются в последовательность полных кодов)
+    """
+    # Пустой алфавит - пустая строка (кодов нет, поэтому любой бит ошибочен)
+    if not freqs:
+        if bits:
+            raise ValueError("Недопустимый код: алфавит пуст")
+        return ""
+    # Алфавит из одного символа: каждый бит кода ('0') - это один символ
+    if len(freqs) == 1:
+        if bits.count("0") != len(bits):
+            raise ValueError("Недопустимый код: для алфавита из одного символа допустим только бит '0'")
+        return freqs[0][0] * len(bits)
+    # Получаем H-дерево (общее для encode и decode)
+    h_t = _tree_for(tuple(map(tuple, freqs)))
+    return h_t.decode_str(bits)
 
-    h_code = ""
-    for ch in s:
-        encoded_c = h_t.encode_char(ch)
-        h_code += encoded_c
-    return h_code
 
+if __name__ == "__main__":
+    test_s = 'ааааааааааааааабббббббввввввггггггддддд'
+    # test_s = 'aaaabcc'
+    # test_s = 'aabacdab'
+    fq = frequencies(test_s)
+    print(fq)
+    code = encode(fq, test_s)
+    print(code)
+    print(decode(fq, code))
 
-test_s = 'ааааааааааааааабббббббввввввггггггддддд'
-# test_s = 'aaaabcc'
-# test_s = 'aabacdab'
-fq = frequencies(test_s)
-print(fq)
-print(encode(fq, test_s))
@@ -0,0 +1,101 @@
+import pytest
+
+import main
+
+TEST_S = 'ааааааааааааааабббббббввввввггггггддддд'
+# Строка длиннее PACK_MIN_LEN: упаковывается скомпилированным ядром (если есть numba)
+LONG_S = TEST_S * 1000 + 'aabacdab' * 1000
+
+
+def _check_bytes_roundtrip(h_t: main.HTree, s: str):
+    """
+    Проверка упакованного кода: биты encode_bytes совпадают с кодом из таблицы кодировки,
+    а decode_bytes восстанавливает исходную строку
+    """
+    data, n_bits = h_t.encode_bytes(s)
+    bits = format(int.from_bytes(data, "big"), f"0{len(data) * 8}b")[:n_bits] if data else ""
+    assert bits == "".join([h_t.encode_table[ch] for ch in s])
+    assert len(data) == (n_bits + 7) // 8
+    assert h_t.decode_bytes(data, n_bits) == s
+
+
+@pytest.mark.parametrize("s", [TEST_S, 'aaaabcc', 'aabacdab', 'ab'])
+def test_encode_decode_roundtrip(s):
+    fq = main.frequencies(s)
+    code = main.encode(fq, s)
+    assert set(code) <= {"0", "1"}
+    assert main.decode(fq, code) == s
+
+
+def test_encode_decode_list_pairs():
+    # Таблица частот из JSON: пары в виде списков
+    fq = [["a", 3], ["b", 2], ["c", 1]]
+    assert main.decode(fq, main.encode(fq, "abcab")) == "abcab"
+
+
+def test_canonical_codes():
+    h_t = main.build_htree('aabacdabxyzzzz')
+    items = sorted((len(code), symbol, code) for symbol, code in h_t.encode_table.items())
+    # Канонический код: в порядке (длина, символ) коды возрастают, если дополнить их нулями справа
+    width = items[-1][0]
+    values = [int(code, 2) << (width - length) for length, _, code in items]
+    assert values == sorted(values)
+    assert len(set(values)) == len(values)
+    # Префиксность: ни один код не является началом другого
+    codes = [code for _, _, code in items]
+    assert not any(a != b and b.startswith(a) for a in codes for b in codes)
+
+
+@pytest.mark.parametrize("s", [TEST_S, 'aaaabcc', 'aaaa', '', LONG_S])
+def test_bytes_roundtrip(s):
+    _check_bytes_roundtrip(main.build_htree(s), s)
+
+
+def test_bytes_roundtrip_chunks(monkeypatch):
+    pytest.importorskip("numba")
+    # Части уменьшены, чтобы проверить склейку их границ
+    monkeypatch.setattr(main, "PACK_WORKERS", 4)
+    monkeypatch.setattr(main, "PACK_CHUNK_LEN", 1000)
+    _check_bytes_roundtrip(main.build_htree(LONG_S), LONG_S)
+
+
+def test_bytes_roundtrip_without_lut():
+    # Веса Фибоначчи дают коды длиннее DECODE_LUT_MAX_BITS
+    weights = [1, 1]
+    while len(weights) < 24:
+        weights.append(weights[-1] + weights[-2])
+    h_t = main.HTree()
+    h_t.create_tree([(chr(0x41 + i), w) for i, w in enumerate(weights)])
+    s = "".join(chr(0x41 + i) for i in range(24)) * 3
+    _check_bytes_roundtrip(h_t, s)
+    assert h_t.decode_lut is None
+    assert h_t.decode_str("".join([h_t.encode_table[ch] for ch in s])) == s
+
+
+def test_encode_unknown_symbol():
+    with pytest.raises(KeyError):
+        main.encode([('a', 3), ('b', 2), ('c', 1)], "abz")
+    with pytest.raises(KeyError):
+        main.encode([('a', 3)], "aax")
+    with pytest.raises(KeyError):
+        main.build_htree("abc").encode_bytes("abz")
+
+
+@pytest.mark.parametrize("freqs, bits", [
+    ([('a', 1), ('b', 2), ('c', 3)], '1'),
+    ([('a', 3)], '0101'),
+    ([], '0'),
+])
+def test_decode_invalid_bits(freqs, bits):
+    with pytest.raises(ValueError):
+        main.decode(freqs, bits)
+
+
+def test_decode_invalid_bits_tree():
+    h_t = main.build_htree('aaaa')
+    with pytest.raises(ValueError):
+        h_t.decode_str('1')
+    with pytest.raises(ValueError):
+        h_t.decode_bytes(b'\x80', 1)
+    with pytest.raises(ValueError):
+        main.build_htree('').decode_str('0')